@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import json
+import math
 from datetime import datetime
 
 # Page config
@@ -19,6 +20,9 @@ if 'elements' not in st.session_state:
     st.session_state.last_element_id = 0  # Add counter for element IDs
     st.session_state.pending_elements = []  # Add pending elements list
 
+if 'templates' not in st.session_state:
+    st.session_state.templates = {}  # User-saved component groups
+
 # Predefined color schemes
 COLOR_SCHEMES = {
     "Modern": {
@@ -50,6 +54,120 @@ COLOR_SCHEMES = {
     }
 }
 
+# Smallest width/height an element may have, matching the sidebar sliders and canvas resize
+MIN_ELEMENT_SIZE = 50
+
+# Increment of the component Scale slider
+SCALE_STEP = 0.05
+
+def snap_scale(scale, rounding):
+    """Snap a scale onto the slider grid, rounding with `math.ceil` or `math.floor`.
+
+    The step count is rounded to 9 places first so float noise such as
+    20.000000000000004 doesn't push the result a whole step.
+    """
+    steps = rounding(round(scale / SCALE_STEP, 9))
+    return round(steps * SCALE_STEP, 9)
+
+def contains(outer, inner):
+    """Check whether `outer` fully covers `inner` on the canvas."""
+    return (
+        outer["x"] <= inner["x"]
+        and outer["y"] <= inner["y"]
+        and outer["x"] + outer["width"] >= inner["x"] + inner["width"]
+        and outer["y"] + outer["height"] >= inner["y"] + inner["height"]
+    )
+
+def normalize_group(elements):
+    """Convert elements to a size-independent group relative to their bounding box.
+
+    Each part gets a `layer` equal to the number of parts that enclose it, so
+    children stack above their containers on the canvas. When two parts share
+    the same bounds, the one listed first counts as the container.
+    """
+    left = min(e["x"] for e in elements)
+    top = min(e["y"] for e in elements)
+    width = max(e["x"] + e["width"] for e in elements) - left
+    height = max(e["y"] + e["height"] for e in elements) - top
+    smallest = min(min(e["width"], e["height"]) for e in elements)
+    return {
+        "width": width,
+        "height": height,
+        # Smallest scale that keeps every part at the 50px minimum
+        "min_scale": snap_scale(MIN_ELEMENT_SIZE / smallest, math.ceil),
+        "elements": [
+            {
+                "type": e["type"],
+                "x": (e["x"] - left) / width,
+                "y": (e["y"] - top) / height,
+                "width": e["width"] / width,
+                "height": e["height"] / height,
+                "text": e.get("text", ""),
+                "options": list(e.get("options", [])),
+                "layer": sum(
+                    contains(other, e) and (j < i or not contains(e, other))
+                    for j, other in enumerate(elements)
+                    if j != i
+                ),
+            }
+            for i, e in enumerate(elements)
+        ],
+    }
+
+# Built-in component groups, laid out in pixels and normalized once at startup
+COMPONENT_TEMPLATES = {
+    name: normalize_group(layout)
+    for name, layout in {
+        "Login Form": [
+            {"type": "Window", "x": 0, "y": 0, "width": 320, "height": 340},
+            {"type": "Text Input", "x": 20, "y": 30, "width": 280, "height": 80, "text": "Username"},
+            {"type": "Text Input", "x": 20, "y": 130, "width": 280, "height": 80, "text": "Password"},
+            {"type": "Button", "x": 20, "y": 230, "width": 280, "height": 80, "text": "Sign In"},
+        ],
+        "Nav Bar": [
+            {"type": "Window", "x": 0, "y": 0, "width": 800, "height": 110},
+            {"type": "Button", "x": 20, "y": 15, "width": 120, "height": 80, "text": "Home"},
+            {"type": "Button", "x": 160, "y": 15, "width": 120, "height": 80, "text": "About"},
+            {"type": "Button", "x": 300, "y": 15, "width": 120, "height": 80, "text": "Contact"},
+            {"type": "Dropdown", "x": 620, "y": 15, "width": 160, "height": 80,
+             "options": ["Profile", "Settings", "Log Out"]},
+        ],
+        "Sidebar Layout": [
+            {"type": "Sidebar", "x": 0, "y": 0, "width": 200, "height": 500},
+            {"type": "Select Box", "x": 20, "y": 30, "width": 160, "height": 80},
+            {"type": "Button", "x": 20, "y": 130, "width": 160, "height": 80, "text": "Apply"},
+            {"type": "Window", "x": 220, "y": 0, "width": 580, "height": 500},
+        ],
+    }.items()
+}
+
+def element_color(element_type, scheme, custom_color):
+    """Resolve an element's fill color for the given scheme."""
+    if scheme == "Custom":
+        return custom_color
+    return COLOR_SCHEMES[scheme][element_type]
+
+def stamp_template(template, x, y, scale, scheme, custom_color):
+    """Place a normalized template at (x, y) scaled by `scale`, returning new elements."""
+    group_width = template["width"] * scale
+    group_height = template["height"] * scale
+    new_elements = []
+    for part in template["elements"]:
+        st.session_state.last_element_id += 1
+        new_elements.append({
+            "id": f"element-{st.session_state.last_element_id}",
+            "type": part["type"],
+            "x": round(x + part["x"] * group_width),
+            "y": round(y + part["y"] * group_height),
+            "width": max(MIN_ELEMENT_SIZE, round(part["width"] * group_width)),
+            "height": max(MIN_ELEMENT_SIZE, round(part["height"] * group_height)),
+            "text": part["text"],
+            "options": list(part["options"]),
+            "layer": part["layer"],
+            "color": element_color(part["type"], scheme, custom_color)
+        })
+    return new_elements
+
 # Custom CSS to make the app full-screen and remove padding
 st.markdown("""
     <style>
@@ -110,10 +228,10 @@ with st.sidebar:
     
     # Custom color picker if "Custom" is selected
     if selected_scheme == "Custom":
-        element_color = st.color_picker("Element Color", "#ffffff")
+        custom_color = st.color_picker("Element Color", "#ffffff")
         handle_color = st.color_picker("Handle Color", "#4a90e2")
     else:
-        element_color = None
+        custom_color = None
         handle_color = "#4a90e2"
     
     # Tool selection
@@ -152,10 +270,80 @@ with st.sidebar:
                 "height": height,
                 "text": text if 'text' in locals() else "",
                 "options": options.split('\n') if 'options' in locals() else [],
-                "color": element_color if selected_scheme == "Custom" else COLOR_SCHEMES[selected_scheme][selected_tool]
+                "layer": 0,
+                "color": element_color(selected_tool, selected_scheme, custom_color)
             }
             st.session_state.elements.append(new_element)
 
+    # Component library
+    st.subheader("Component Library")
+    templates = {**COMPONENT_TEMPLATES, **st.session_state.templates}
+    selected_template = st.selectbox("Component", list(templates))
+    col1, col2 = st.columns(2)
+    with col1:
+        template_x = st.number_input("Group X", 0, st.session_state.canvas_width, 50)
+    with col2:
+        template_y = st.number_input("Group Y", 0, st.session_state.canvas_height, 50)
+    template = templates[selected_template]
+    min_scale = template["min_scale"]
+    # Largest scale at which the whole group still fits on the canvas
+    max_scale = snap_scale(min(
+        st.session_state.canvas_width / template["width"],
+        st.session_state.canvas_height / template["height"]
+    ), math.floor)
+    if max_scale > min_scale:
+        template_scale = st.slider(
+            "Scale",
+            min_scale,
+            max_scale,
+            min(max(1.0, min_scale), max_scale),
+            SCALE_STEP
+        )
+    else:
+        template_scale = min_scale
+        st.info(f"This component can only be inserted at scale {min_scale}.")
+
+    if st.button("Insert Component"):
+        st.session_state.elements.extend(stamp_template(
+            templates[selected_template],
+            template_x,
+            template_y,
+            template_scale,
+            selected_scheme,
+            custom_color
+        ))
+
+    st.warning("⚠️ Note: Saving a component uses the positions/sizes the elements were added with. Moves and resizes made on the canvas are not included.")
+    template_name = st.text_input("Save Canvas As", "").strip()
+    # Untick the replace box after a save so the next overwrite asks again
+    if st.session_state.pop("reset_replace_component", False):
+        st.session_state.replace_component = False
+    replace_existing = False
+    if template_name in st.session_state.templates:
+        st.warning(f"A component named '{template_name}' already exists.")
+        replace_existing = st.checkbox("Replace existing component", key="replace_component")
+    if st.button("Save as Component"):
+        if not template_name:
+            st.error("Enter a name for the component.")
+        elif template_name in COMPONENT_TEMPLATES:
+            st.error(f"'{template_name}' is a built-in component. Choose another name.")
+        elif template_name in st.session_state.templates and not replace_existing:
+            st.error("Tick 'Replace existing component' to overwrite it.")
+        elif not st.session_state.elements:
+            st.error("Add elements to the canvas before saving a component.")
+        else:
+            st.session_state.templates[template_name] = normalize_group(st.session_state.elements)
+            st.session_state.reset_replace_component = True
+            st.rerun()
+
+    # Recolor every element on the canvas with the selected scheme
+    if st.button("Apply Scheme to Canvas"):
+        st.session_state.elements = [
+            {**e, "color": element_color(e["type"], selected_scheme, custom_color)}
+            for e in st.session_state.elements
+        ]
+        st.rerun()
+
     # Clear canvas button
     if st.button("Clear Canvas"):
         st.session_state.elements = []
@@ -168,7 +356,11 @@ with st.sidebar:
                 "width": st.session_state.canvas_width,
                 "height": st.session_state.canvas_height
             },
-            "elements": st.session_state.elements
+            # Stacking order only matters to the canvas, so leave it out of the prompt
+            "elements": [
+                {key: value for key, value in e.items() if key != "layer"}
+                for e in st.session_state.elements
+            ]
         }
         st.download_button(
             "Download Prompt",
@@ -260,7 +452,7 @@ threejs_code = '''
                     handle.position.set(
                         element.position.x + xOffset,
                         element.position.y + yOffset,
-                        1
+                        element.position.z + 0.5
                     );
                 });
             }
@@ -305,7 +497,7 @@ threejs_code = '''
                 handle.position.set(
                     element.position.x + xOffset,
                     element.position.y + yOffset,
-                    1
+                    element.position.z + 0.5
                 );
                 
                 window.threeJsState.scene.add(handle);
@@ -401,7 +593,7 @@ threejs_code = '''
                     
                     mesh.position.x = element.x - containerRect.width/2 + element.width/2;
                     mesh.position.y = -element.y + containerRect.height/2 - element.height/2;
-                    mesh.position.z = 0;
+                    mesh.position.z = element.layer || 0;  // Children stack above their containers
                     
                     mesh.userData = {...element, isMainElement: true};
                     window.threeJsState.scene.add(mesh);
@@ -479,6 +671,7 @@ threejs_code = '''
             const raycaster = new THREE.Raycaster();
             raycaster.setFromCamera(mouse, window.threeJsState.camera);
             
+            // Hits are sorted nearest first, so the first one is the topmost layer
             const intersects = raycaster.intersectObjects(window.threeJsState.scene.children);
             
             if (intersects.length > 0) {
@@ -556,7 +749,7 @@ threejs_code = '''
                 
                 parentElement.geometry.dispose();
                 parentElement.geometry = new THREE.PlaneGeometry(newWidth, newHeight);
-                parentElement.position.set(newX, newY, 0);
+                parentElement.position.set(newX, newY, parentElement.position.z);
                 parentElement.userData.width = newWidth;
                 parentElement.userData.height = newHeight;
                 